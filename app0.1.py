@@ -1,76 +1,281 @@
 import streamlit as st
 import os
+import errno
 import json
+import hashlib
 import re
 import tempfile 
+import shutil
 import time
-from datetime import datetime, timedelta
-
-# Selenium imports
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException, InvalidArgumentException
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.keys import Keys
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import quote
+
+# Selenium is imported inside the functions that drive the browser, so the first page paint
+# does not pay for it.
+
+# Characters stripped from uploaded file names before they are written to disk.
+_FNAME_RE = re.compile(r'[^\w\s.-]')
+# Blank lines separating messages in the messages box.
+_MESSAGE_SPLIT_RE = re.compile(r'\n\s*\n')
+# Free space /dev/shm needs before uploads are kept there. Container hosts often mount a 64 MB
+# /dev/shm (the reason Chrome runs with --disable-dev-shm-usage), which multi-image uploads overflow.
+SHM_MIN_FREE_BYTES = 512 * 1024 * 1024
+
+def pick_upload_temp_dir():
+    """Returns the RAM-backed /dev/shm when it has room to spare, else None for the default temp dir."""
+    try:
+        if shutil.disk_usage('/dev/shm').free >= SHM_MIN_FREE_BYTES:
+            return '/dev/shm'
+    except OSError:
+        pass
+    return None
 
 # --- Selenium Driver Management for Streamlit Cloud ---
-if 'driver' not in st.session_state:
-    st.session_state.driver = None
+DRIVER_SESSION_FILE = os.path.expanduser("~/.ig_msgr_session.json")
+# HTTP connections kept open to chromedriver when reattaching to a saved session.
+DRIVER_HTTP_POOL_SIZE = 20
+# Persistent Chrome profile so cookies and caches survive browser relaunches.
+CHROME_PROFILE_DIR = os.path.expanduser("~/.ig_msgr_profile")
+# URL patterns the automation tabs never need to download.
+BLOCKED_RESOURCE_URLS = ["*.jpg", "*.jpeg", "*.png", "*.webp", "*.gif", "*.mp4", "*.woff*", "*.ttf", "fonts.googleapis.com/*"]
+# Each message in an open Instagram thread is rendered as one of these rows. Sends are confirmed by
+# this row count growing, so this is the selector to check first if Instagram changes its markup and
+# messages start being reported as unconfirmed even though they arrive.
+MESSAGE_ROW_SELECTOR = "div[role='row']"
+# Cookie-export sameSite values mapped to the CDP CookieSameSite enum.
+CDP_SAME_SITE = {"strict": "Strict", "lax": "Lax", "none": "None", "no_restriction": "None"}
+# Attempts at finding the chat composer before an influencer is skipped.
+COMPOSER_WAIT_ATTEMPTS = 3
+# Number of chats loaded side by side in separate tabs of the shared browser.
+TAB_POOL_SIZE = 4
+# Status lines kept on screen while a batch runs.
+STATUS_LOG_LINES = 5
+# Origin the cookies are scoped to and every chat URL is built on.
+INSTAGRAM_BASE_URL = "https://www.instagram.com/"
+# Path of a direct-message thread; the influencer ID is percent-encoded before it is filled in.
+DIRECT_THREAD_PATH = "/direct/t/{}/"
+
+def direct_thread_path(influencer_id):
+    """Returns the URL path of the DM thread for `influencer_id`, safe for IDs with odd characters."""
+    return DIRECT_THREAD_PATH.format(quote(influencer_id, safe=''))
+
+@st.cache_resource
+def get_driver_singleton():
+    """Process-wide holder for the shared browser and the hash of the cookies currently loaded in it.
+
+    Streamlit re-executes this script on every run, so a plain module global would be rebuilt each
+    time; cache_resource hands every run and session the same dict.
+
+    The app is meant for a single operator: there is one browser with one cookie jar for the whole
+    process. `lock` guards getting or launching the driver; `run_lock` is held for an entire
+    automation run, so a second session can neither swap in its own cookies mid-run nor close the
+    browser underneath it.
+    """
+    return {"driver": None, "applied_cookies_hash": None, "lock": threading.Lock(), "run_lock": threading.Lock()}
+
+def save_driver_session(driver):
+    """Persists the executor URL and session id so a later rerun can reattach to the browser."""
+    try:
+        with open(DRIVER_SESSION_FILE, "w") as f:
+            json.dump({"executor_url": driver.command_executor._url, "session_id": driver.session_id}, f)
+    except OSError:
+        pass
+
+def reconnect_selenium_driver():
+    """Reattaches to the browser recorded in DRIVER_SESSION_FILE, or returns None if it is gone."""
+    if not os.path.exists(DRIVER_SESSION_FILE):
+        return None
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    class ReuseChrome(webdriver.Remote):
+        """Remote driver that attaches to an already running browser session instead of starting a new one."""
+        def __init__(self, command_executor, session_id):
+            self.r_session_id = session_id
+            client_kwargs = {}
+            try:
+                from selenium.webdriver.remote.client_config import ClientConfig
+                # Keep-alive connections with room for the waits that overlap with regular commands.
+                client_kwargs["client_config"] = ClientConfig(
+                    remote_server_addr=command_executor, keep_alive=True,
+                    init_args_for_pool_manager={"init_args_for_pool_manager": {"maxsize": DRIVER_HTTP_POOL_SIZE}},
+                )
+            except ImportError:
+                pass  # Selenium before 4.26 has no ClientConfig; keep its default connection.
+            super().__init__(command_executor=command_executor, options=Options(), **client_kwargs)
+
+        def start_session(self, *args, **kwargs):
+            self.session_id = self.r_session_id
+            self.caps = {}
+
+    try:
+        with open(DRIVER_SESSION_FILE) as f:
+            saved = json.load(f)
+        driver = ReuseChrome(command_executor=saved["executor_url"], session_id=saved["session_id"])
+        driver.title
+        return driver
+    except Exception:
+        os.remove(DRIVER_SESSION_FILE)
+        return None
 
 def get_selenium_driver():
-    """Initializes a headless Selenium WebDriver for Streamlit Cloud."""
-    if st.session_state.driver is None:
-        try:
-            st.info("🌐 Initializing headless browser for Streamlit Cloud...")
-            options = Options()
-            options.add_argument("--headless")
-            options.add_argument("--no-sandbox")
-            options.add_argument("--disable-dev-shm-usage")
-            options.add_argument("--disable-gpu")
-            options.add_argument("--window-size=1920,1080")
-            options.add_argument("--log-level=3")
-            
-            service = Service(executable_path='/usr/bin/chromium-driver')
-
-            driver = webdriver.Chrome(service=service, options=options)
-            st.session_state.driver = driver
-            st.success("✅ Successfully initialized headless Chrome driver!")
-        except WebDriverException as e:
-            st.error(f"❌ Failed to initialize Chrome driver: {e}")
-            st.warning("Ensure you have a `packages.txt` file in your repository with `chromium-driver` and `chromium` listed inside.")
-            st.session_state.driver = None
-            st.stop()
-    return st.session_state.driver
+    """Returns the shared Selenium WebDriver, reattaching to or launching a browser if it is gone."""
+    from selenium.common.exceptions import WebDriverException
+
+    singleton = get_driver_singleton()
+    with singleton["lock"]:
+        if singleton["driver"] is not None:
+            try:
+                singleton["driver"].current_url
+                return singleton["driver"]
+            except WebDriverException:
+                singleton["driver"] = None
+        singleton["driver"] = reconnect_selenium_driver()
+        singleton["applied_cookies_hash"] = None
+        if singleton["driver"] is None:
+            singleton["driver"] = launch_selenium_driver()
+        return singleton["driver"]
+
+def launch_selenium_driver():
+    """Starts a fresh headless Chrome, or stops the script run with an error if it cannot."""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.chrome.options import Options
+    from selenium.common.exceptions import WebDriverException
+
+    try:
+        st.info("🌐 Initializing headless browser for Streamlit Cloud...")
+        options = Options()
+        options.add_argument("--headless=new")
+        options.add_argument("--no-sandbox")
+        options.add_argument("--disable-dev-shm-usage")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--disable-software-rasterizer")
+        options.add_argument("--disable-background-networking")
+        options.add_argument("--disable-breakpad")
+        options.add_argument("--disable-component-update")
+        options.add_argument("--no-first-run")
+        options.add_argument("--disable-extensions")
+        options.add_argument("--disable-sync")
+        options.add_argument("--metrics-recording-only")
+        options.add_argument("--window-size=1280,800")
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_argument("--log-level=3")
+        os.makedirs(CHROME_PROFILE_DIR, exist_ok=True)
+        options.add_argument(f"--user-data-dir={CHROME_PROFILE_DIR}")
+        options.add_argument("--profile-directory=Default")
+        options.add_experimental_option("prefs", {
+            "profile.default_content_setting_values.images": 2,
+            "profile.managed_default_content_settings.images": 2,
+        })
+        # Return from driver.get() on DOMContentLoaded; the element waits handle readiness.
+        options.page_load_strategy = 'eager'
+        
+        service = Service(executable_path='/usr/bin/chromium-driver')
+
+        driver = webdriver.Chrome(service=service, options=options)
+        # Lookups fail fast; the explicit waits do all the polling.
+        driver.implicitly_wait(0)
+        driver.set_page_load_timeout(30)
+        block_heavy_resources(driver)
+        save_driver_session(driver)
+        st.success("✅ Successfully initialized headless Chrome driver!")
+        return driver
+    except WebDriverException as e:
+        st.error(f"❌ Failed to initialize Chrome driver: {e}")
+        st.warning("Ensure you have a `packages.txt` file in your repository with `chromium-driver` and `chromium` listed inside.")
+        st.stop()
 
 def close_selenium_driver():
     """Quits the Selenium WebDriver session."""
-    if st.session_state.driver:
-        st.session_state.driver.quit()
-        st.session_state.driver = None
-        st.info("Automated browser session closed.")
+    from selenium.common.exceptions import WebDriverException
 
-def apply_cookies(driver, cookies_json):
-    """Deletes existing cookies and applies new ones from a JSON string."""
+    singleton = get_driver_singleton()
     try:
-        cookies = json.loads(cookies_json)
-        driver.delete_all_cookies()
-        
-        # Need to navigate to the domain first to set the cookies
-        base_url = "https://www.instagram.com/"
-        driver.get(base_url)
-        
-        for cookie in cookies:
-            if 'domain' in cookie: del cookie['domain']
-            if 'sameSite' in cookie: del cookie['sameSite']
-            if 'expiry' in cookie: del cookie['expiry'] 
+        with singleton["lock"]:
+            if singleton["driver"]:
+                try:
+                    singleton["driver"].quit()
+                except WebDriverException:
+                    pass  # A reattached driver raises here when its session is already dead.
+                finally:
+                    singleton["driver"] = None
+                    singleton["applied_cookies_hash"] = None
+                st.info("Automated browser session closed.")
+    finally:
+        if os.path.exists(DRIVER_SESSION_FILE):
+            os.remove(DRIVER_SESSION_FILE)
+
+def supports_cdp(driver):
+    """True for drivers that can send CDP commands.
+
+    webdriver.Remote defines execute_cdp_cmd too, but a reattached ReuseChrome has no browser
+    capabilities to route it with, so only a locally launched Chromium driver counts.
+    """
+    from selenium.webdriver.chromium.webdriver import ChromiumDriver
+
+    return isinstance(driver, ChromiumDriver)
+
+def to_cdp_cookie(cookie):
+    """Maps an exported browser cookie to the Network.CookieParam shape CDP expects."""
+    cdp_cookie = {"name": cookie["name"], "value": cookie["value"], "path": cookie.get("path", "/")}
+    if cookie.get("domain"):
+        cdp_cookie["domain"] = cookie["domain"]
+    else:
+        cdp_cookie["url"] = INSTAGRAM_BASE_URL
+    expires = cookie.get("expiry", cookie.get("expirationDate"))
+    if expires:
+        cdp_cookie["expires"] = expires
+    for flag in ("httpOnly", "secure"):
+        if flag in cookie:
+            cdp_cookie[flag] = cookie[flag]
+    same_site = CDP_SAME_SITE.get(str(cookie.get("sameSite", "")).lower())
+    if same_site:
+        cdp_cookie["sameSite"] = same_site
+    return cdp_cookie
+
+@st.cache_data(show_spinner=False)
+def parse_cookies(cookies_json):
+    """Parses the pasted cookie export; cached on the raw text so re-pasting the same cookies is free."""
+    return json.loads(cookies_json)
+
+def cookies_look_valid(cookies_json):
+    """Cheap client-side check that the pasted text is a JSON list of name/value cookies."""
+    try:
+        cookies = parse_cookies(cookies_json)
+    except json.JSONDecodeError:
+        return False
+    return isinstance(cookies, list) and all(isinstance(c, dict) and "name" in c and "value" in c for c in cookies)
+
+def apply_cookies(driver, cookies):
+    """Deletes existing cookies and applies the parsed cookie list."""
+    from selenium.common.exceptions import InvalidArgumentException
+
+    try:
+        base_url = INSTAGRAM_BASE_URL
+
+        if supports_cdp(driver):
+            # One CDP command for the whole cookie jar instead of an add_cookie round trip per cookie.
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            driver.execute_cdp_cmd("Network.setCookies", {"cookies": [to_cdp_cookie(c) for c in cookies]})
+        else:
+            driver.delete_all_cookies()
             
-            try:
-                driver.add_cookie(cookie)
-            except InvalidArgumentException as e:
-                st.warning(f"Could not add cookie: {cookie.get('name', 'N/A')}. Error: {e}")
+            # Need to navigate to the domain first to set the cookies
+            driver.get(base_url)
+            
+            for cookie in cookies:
+                if 'domain' in cookie: del cookie['domain']
+                if 'sameSite' in cookie: del cookie['sameSite']
+                if 'expiry' in cookie: del cookie['expiry'] 
+                
+                try:
+                    driver.add_cookie(cookie)
+                except InvalidArgumentException as e:
+                    st.warning(f"Could not add cookie: {cookie.get('name', 'N/A')}. Error: {e}")
                 
         # Re-navigate to refresh the session
         driver.get(base_url)
@@ -80,6 +285,189 @@ def apply_cookies(driver, cookies_json):
         st.error(f"❌ Failed to apply cookies: {e}")
         return False
 
+# Sends every message from inside the page in one WebDriver command: for each one it sets the
+# composer value through the native setter (so React sees the change), presses Enter and waits
+# for a new message row before the next. Resolves with the number of messages confirmed.
+# The row count is a heuristic tied to Instagram's current markup (see MESSAGE_ROW_SELECTOR): a
+# message can arrive without being counted, so an unconfirmed message is not necessarily unsent.
+SEND_MESSAGES_JS = """
+const [composer, messages, composerCss, rowCss, perMessageMs, done] = arguments;
+const setter = Object.getOwnPropertyDescriptor(window.HTMLTextAreaElement.prototype, 'value').set;
+const rowCount = () => document.querySelectorAll(rowCss).length;
+const rowAdded = (before) => new Promise((resolve) => {
+    if (rowCount() > before) { resolve(true); return; }
+    const obs = new MutationObserver(() => {
+        if (rowCount() > before) { obs.disconnect(); clearTimeout(timer); resolve(true); }
+    });
+    obs.observe(document.documentElement, {childList: true, subtree: true});
+    const timer = setTimeout(() => { obs.disconnect(); resolve(false); }, perMessageMs);
+});
+(async () => {
+    let t = composer;
+    for (let i = 0; i < messages.length; i++) {
+        // Instagram may re-render the composer after a send; pick up the new one.
+        if (!t.isConnected) t = document.querySelector(composerCss);
+        if (!t) { done(i); return; }
+        const before = rowCount();
+        setter.call(t, messages[i]);
+        t.dispatchEvent(new Event('input', {bubbles: true}));
+        t.dispatchEvent(new KeyboardEvent('keydown', {key: 'Enter', code: 'Enter', keyCode: 13, which: 13, bubbles: true}));
+        if (!await rowAdded(before)) { done(i); return; }
+    }
+    done(messages.length);
+})();
+"""
+
+# Resolves with the first element matching arguments[0] as soon as it is attached to the DOM.
+# With extra selectors in arguments[1], resolves with [element, ...their matches or null] instead.
+WAIT_FOR_ELEMENT_JS = """
+const [css, extraCss, timeoutMs, done] = arguments;
+const resolve = (el) => done(extraCss.length ? [el, ...extraCss.map(s => document.querySelector(s))] : el);
+const found = document.querySelector(css);
+if (found) { resolve(found); return; }
+const obs = new MutationObserver(() => {
+    const el = document.querySelector(css);
+    if (el) { obs.disconnect(); resolve(el); }
+});
+obs.observe(document.documentElement, {childList: true, subtree: true});
+setTimeout(() => obs.disconnect(), timeoutMs);
+"""
+
+def block_heavy_resources(driver):
+    """Blocks images, video and web fonts in the current tab via CDP; chats only need the DOM."""
+    if not supports_cdp(driver):
+        return
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_RESOURCE_URLS})
+
+def get_tab_handles(driver, count):
+    """Returns `count` window handles, opening extra tabs in the shared browser as needed."""
+    while len(driver.window_handles) < count:
+        driver.switch_to.new_window('tab')
+        block_heavy_resources(driver)
+    return driver.window_handles[:count]
+
+def wait_element_js(driver, css, timeout=40, extra_css=()):
+    """Waits for `css` with an in-page MutationObserver instead of polling over WebDriver; returns the element.
+
+    Any `extra_css` selectors are looked up in the same call, and the result becomes
+    [element, *extra matches], with None for extras not on the page yet.
+    """
+    driver.set_script_timeout(timeout)
+    return driver.execute_async_script(WAIT_FOR_ELEMENT_JS, css, list(extra_css), timeout * 1000)
+
+def fluent_wait(driver, timeout, poll_frequency=0.25):
+    """WebDriverWait that polls every 250 ms by default and rides out elements re-rendering mid-check."""
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException
+
+    return WebDriverWait(driver, timeout, poll_frequency=poll_frequency,
+                         ignored_exceptions=(NoSuchElementException, StaleElementReferenceException))
+
+class MessagesNotConfirmed(Exception):
+    """Raised when only some of an influencer's messages showed up in the thread.
+
+    Unlike a TimeoutException, the chat did load and `sent` messages already went out, so blindly
+    retrying the influencer would send those again.
+    """
+    def __init__(self, sent, total):
+        super().__init__(f"Only {sent} of {total} message(s) showed up in the thread.")
+        self.sent = sent
+        self.total = total
+
+def send_messages_js(driver, composer, composer_css, messages, timeout_per_message=10):
+    """Sends all `messages` through SEND_MESSAGES_JS; raises MessagesNotConfirmed if one is not confirmed."""
+    driver.set_script_timeout(timeout_per_message * len(messages) + 5)
+    sent = driver.execute_async_script(
+        SEND_MESSAGES_JS, composer, messages, composer_css, MESSAGE_ROW_SELECTOR, timeout_per_message * 1000
+    )
+    if sent < len(messages):
+        raise MessagesNotConfirmed(sent, len(messages))
+
+def is_rate_limited(driver):
+    """True if Instagram is showing its 'Try again later' throttling notice in the current tab."""
+    from selenium.webdriver.common.by import By
+
+    return bool(driver.find_elements(By.XPATH, "//*[contains(text(),'Try again later')]"))
+
+def set_file_input_files(driver, file_input_selector, file_input_element, paths):
+    """Hands every path to the file input with one CDP DOM.setFileInputFiles call; send_keys without CDP."""
+    from selenium.common.exceptions import WebDriverException
+
+    if supports_cdp(driver):
+        try:
+            root = driver.execute_cdp_cmd("DOM.getDocument", {"depth": 0})["root"]
+            node = driver.execute_cdp_cmd("DOM.querySelector", {"nodeId": root["nodeId"], "selector": file_input_selector})
+            # nodeId 0 means the input was re-rendered away; let send_keys find out for itself.
+            if node["nodeId"]:
+                driver.execute_cdp_cmd("DOM.setFileInputFiles", {"files": paths, "nodeId": node["nodeId"]})
+                return
+        except WebDriverException:
+            pass  # Fall back to the WebDriver upload below.
+    file_input_element.send_keys("\n".join(paths))
+
+STATUS_ICONS = {"info": "ℹ️", "success": "✅", "warning": "⚠️", "error": "❌"}
+
+def report_status(placeholder, level, message):
+    """Appends a status line to the rolling log and redraws the last few lines in one write."""
+    if message == st.session_state.get('last_status') and level == st.session_state.get('last_status_level'):
+        return
+    if 'status_log' not in st.session_state:
+        st.session_state['status_log'] = deque(maxlen=STATUS_LOG_LINES)
+    st.session_state.status_log.append(f"{STATUS_ICONS[level]} {message}")
+    st.session_state.last_status = message
+    st.session_state.last_status_level = level
+    placeholder.markdown("\n\n".join(st.session_state.status_log))
+
+def send_to_influencer(driver, influencer_id, messages_to_send, image_paths_to_send, status_placeholder):
+    """Sends the messages and images in the chat already loading in the driver's current tab."""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.common.exceptions import (
+        TimeoutException, StaleElementReferenceException, ElementNotInteractableException,
+        InvalidArgumentException, JavascriptException,
+    )
+
+    message_input_selector = 'textarea[placeholder*="Message..."]'
+    file_input_selector = 'input[accept*="image/jpeg,image/png,image/heic,image/heif,video/mp4,video/quicktime"]'
+    
+    fluent_wait(driver, 15, poll_frequency=0.1).until(EC.url_contains(direct_thread_path(influencer_id)))
+    # Short waits with backoff so a broken chat is given up on quickly instead of stalling for 40 s.
+    for attempt in range(COMPOSER_WAIT_ATTEMPTS):
+        try:
+            # The file input sits next to the composer, so fetch both in one round-trip.
+            message_textarea, file_input_element = wait_element_js(
+                driver, message_input_selector, timeout=5, extra_css=(file_input_selector,))
+            break
+        except TimeoutException:
+            if attempt == COMPOSER_WAIT_ATTEMPTS - 1:
+                raise
+            time.sleep(2 ** attempt)
+
+    if messages_to_send:
+        report_status(status_placeholder, "success", f"Sending {len(messages_to_send)} message(s) to `{influencer_id}`...")
+        send_messages_js(driver, message_textarea, message_input_selector, messages_to_send)
+        report_status(status_placeholder, "success", f"{len(messages_to_send)} message(s) sent successfully.")
+
+    if image_paths_to_send:
+        report_status(status_placeholder, "info", f"Attempting to upload {len(image_paths_to_send)} image(s)...")
+        try:
+            if file_input_element is None:
+                file_input_element = wait_element_js(driver, file_input_selector, timeout=10)
+            rows_before = len(driver.find_elements(By.CSS_SELECTOR, MESSAGE_ROW_SELECTOR))
+            set_file_input_files(driver, file_input_selector, file_input_element, image_paths_to_send)
+            
+            report_status(status_placeholder, "success", "Image(s) sent to upload input. Waiting for Instagram to process...")
+            # Instagram either shows an attachment preview (with a remove button) or posts the images
+            # straight into the thread; stop waiting as soon as either happens.
+            fluent_wait(driver, 15, poll_frequency=0.1).until(EC.any_of(
+                EC.presence_of_element_located((By.CSS_SELECTOR, 'div[aria-label*="Remove"]')),
+                lambda d: len(d.find_elements(By.CSS_SELECTOR, MESSAGE_ROW_SELECTOR)) > rows_before,
+            ))
+        except (TimeoutException, StaleElementReferenceException, ElementNotInteractableException,
+                InvalidArgumentException, JavascriptException) as e:
+            report_status(status_placeholder, "error", f"Error during image upload: {e}. Proceeding without image for this influencer.")
+
 # --- Streamlit UI Configuration ---
 st.set_page_config(
     page_title="Instagram Affiliate Messenger",
@@ -96,68 +484,127 @@ st.info("This is the cloud version. It runs in a headless browser and requires a
 # --- Cookie Management Section ---
 cookie_data = st.text_area(
     "Paste your Instagram cookies (JSON format)",
+    key="cookie_data",
     height=250,
     help="1. Log in to Instagram in your browser.\n2. Use a browser extension (like 'EditThisCookie') to export your session cookies as JSON.\n3. Paste the full JSON string here."
 )
 
 if st.button("Close Automated Browser Session", help="Closes the Selenium connection."):
-    close_selenium_driver()
+    run_lock = get_driver_singleton()["run_lock"]
+    if run_lock.acquire(blocking=False):
+        try:
+            close_selenium_driver()
+        finally:
+            run_lock.release()
+    else:
+        st.warning("The automated browser is busy with a running session. Stop that session before closing it.")
     
 st.markdown("---")
 
 # --- Multiple Influencer ID Input ---
 st.subheader("Influencers to Message")
-influencer_ids_input = st.text_area(
+st.text_area(
     "Enter Influencer IDs (one per line)",
+    key="influencer_ids_input",
     height=200,
     placeholder="e.g.,\n1234567890\n9876543210\n..."
 )
 
 # --- Multiple Custom Messages Input ---
 st.subheader("Messages to Send")
-if 'custom_messages' not in st.session_state:
-    st.session_state.custom_messages = [""]
-
-for i, msg in enumerate(st.session_state.custom_messages):
-    st.session_state.custom_messages[i] = st.text_area(f"Message {i+1}", value=msg, key=f"message_input_{i}", height=100)
-
-col_msg_buttons = st.columns(2)
-with col_msg_buttons[0]:
-    if st.button("Add Another Message", key="add_msg_btn"):
-        st.session_state.custom_messages.append("")
-        st.rerun()
-with col_msg_buttons[1]:
-    if len(st.session_state.custom_messages) > 1 and st.button("Remove Last Message", key="remove_msg_btn"):
-        st.session_state.custom_messages.pop()
-        st.rerun()
+def get_messages_to_send():
+    """Splits the messages box on blank lines into the non-empty message texts."""
+    messages = _MESSAGE_SPLIT_RE.split(st.session_state.get("messages_raw", ""))
+    return [msg.strip() for msg in messages if msg.strip()]
+
+# One box for all messages; a blank line starts the next message.
+st.text_area(
+    "Messages (separate messages with a blank line)",
+    key="messages_raw",
+    height=200,
+    placeholder="First message...\n\nSecond message..."
+)
 
 # --- Image Upload Input (Modified for multiple files) ---
 st.subheader("Images to Attach (Optional)")
-uploaded_files = st.file_uploader("Upload images", type=["png", "jpg", "jpeg", "gif"], accept_multiple_files=True, key="images_upload")
-
 if 'uploaded_image_paths' not in st.session_state:
     st.session_state['uploaded_image_paths'] = []
+if 'image_hashes' not in st.session_state:
+    st.session_state.image_hashes = {}
+# Bumping this gives the uploader a fresh key, which is the only way to empty it.
+if 'images_upload_generation' not in st.session_state:
+    st.session_state['images_upload_generation'] = 0
+
+def get_upload_temp_dir():
+    """Returns the session's upload directory, creating it on the first upload."""
+    if 'temp_dir_obj' not in st.session_state:
+        st.session_state['temp_dir_obj'] = tempfile.TemporaryDirectory(prefix="ig_msgr_", dir=pick_upload_temp_dir())
+    return st.session_state['temp_dir_obj'].name
+
+def cleanup_upload_temp_dir():
+    """Removes every saved upload in one go and forgets the cached paths."""
+    temp_dir_obj = st.session_state.pop('temp_dir_obj', None)
+    if temp_dir_obj is not None:
+        temp_dir_obj.cleanup()
+    st.session_state.image_hashes = {}
+
+def clear_uploaded_images():
+    """Empties the uploader and deletes the saved copies of its images."""
+    cleanup_upload_temp_dir()
+    st.session_state['uploaded_image_paths'] = []
+    st.session_state.images_upload_generation += 1
+
+uploaded_files = st.file_uploader(
+    "Upload images", type=["png", "jpg", "jpeg", "gif"], accept_multiple_files=True,
+    key=f"images_upload_{st.session_state.images_upload_generation}"
+)
+st.button("Clear Images", disabled=not uploaded_files or st.session_state.get('automation_running', False), on_click=clear_uploaded_images)
+
+def write_temp_image(job):
+    """Streams one upload into its own uniquely named temp file and returns the path."""
+    uploaded_file, stem, ext, temp_dir = job
+    uploaded_file.seek(0)
+    with tempfile.NamedTemporaryFile(prefix=f"{stem}_", suffix=ext, dir=temp_dir, delete=False) as f:
+        shutil.copyfileobj(uploaded_file, f, length=1024 * 1024)
+    return f.name
 
 if uploaded_files:
-    st.session_state['uploaded_image_paths'] = []
+    image_paths = []
+    pending_writes = []
+    upload_stamp = datetime.now().strftime('%Y%m%d%H%M%S')
     for i, uploaded_file in enumerate(uploaded_files):
         st.image(uploaded_file, caption=f"Uploaded Image {i+1}", width=150)
-        try:
-            temp_dir = tempfile.gettempdir()
-            sanitized_filename = re.sub(r'[^\w\s.-]', '', uploaded_file.name).strip()
-            if not sanitized_filename:
-                sanitized_filename = f"uploaded_image_{datetime.now().strftime('%Y%m%d%H%M%S')}_{i}.tmp"
-            
-            temp_file_path = os.path.join(temp_dir, sanitized_filename)
-
-            with open(temp_file_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-            st.session_state['uploaded_image_paths'].append(temp_file_path)
-            st.info(f"Image '{uploaded_file.name}' saved temporarily.")
-        except Exception as e:
-            st.error(f"Error saving uploaded image '{uploaded_file.name}': {e}")
-            st.session_state['uploaded_image_paths'] = []
-            break
+        # Every rerun hands back the same uploads; reuse the temp file already written for identical bytes.
+        content_hash = hashlib.blake2b(uploaded_file.getbuffer(), digest_size=16).hexdigest()
+        cached_path = st.session_state.image_hashes.get(content_hash)
+        if cached_path and os.path.exists(cached_path):
+            image_paths.append(cached_path)
+            continue
+
+        sanitized_filename = _FNAME_RE.sub('', uploaded_file.name).strip()
+        if not sanitized_filename:
+            sanitized_filename = f"uploaded_image_{upload_stamp}_{i}.tmp"
+        stem, ext = os.path.splitext(sanitized_filename)
+        pending_writes.append((len(image_paths), content_hash, uploaded_file, stem, ext))
+        image_paths.append(None)
+
+    try:
+        if pending_writes:
+            temp_dir = get_upload_temp_dir()
+            # The writes are I/O bound, so a small thread pool overlaps them.
+            with ThreadPoolExecutor(max_workers=min(8, len(pending_writes))) as executor:
+                written_paths = list(executor.map(write_temp_image, [(*job[2:], temp_dir) for job in pending_writes]))
+            for (slot, content_hash, *_), temp_path in zip(pending_writes, written_paths):
+                image_paths[slot] = temp_path
+                st.session_state.image_hashes[content_hash] = temp_path
+            st.info(f"{len(pending_writes)} image(s) saved temporarily.")
+        st.session_state['uploaded_image_paths'] = image_paths
+    except Exception as e:
+        if isinstance(e, OSError) and e.errno == errno.ENOSPC:
+            st.error("Not enough disk space to save the uploaded images. Try fewer or smaller images.")
+        else:
+            st.error(f"Error saving uploaded images: {e}")
+        st.session_state['uploaded_image_paths'] = []
 else:
     st.session_state['uploaded_image_paths'] = []
 
@@ -166,167 +613,203 @@ if 'influencer_list' not in st.session_state:
     st.session_state['influencer_list'] = []
 if 'current_influencer_index' not in st.session_state:
     st.session_state['current_influencer_index'] = 0
+if 'consec_fail' not in st.session_state:
+    st.session_state['consec_fail'] = 0
+if 'failed_influencers' not in st.session_state:
+    st.session_state['failed_influencers'] = []
 if 'automation_running' not in st.session_state:
     st.session_state['automation_running'] = False
 if 'last_status' not in st.session_state:
     st.session_state['last_status'] = "Ready to start automation. Please configure the inputs and click 'Start Messaging Session'."
+if 'last_status_level' not in st.session_state:
+    st.session_state['last_status_level'] = "info"
 
 st.markdown("---")
 
 # --- Automation Control Buttons ---
-col1, col2 = st.columns(2)
-status_message_placeholder = st.empty()
-
-with col1:
-    start_button_disabled = st.session_state.automation_running
-    start_button = st.button("Start Messaging Session", type="primary", use_container_width=True, disabled=start_button_disabled)
-
-with col2:
-    stop_button_disabled = not st.session_state.automation_running
-    stop_button = st.button("Stop Automation", type="secondary", use_container_width=True, disabled=stop_button_disabled)
-
-if stop_button: 
+def request_stop():
+    """Stop button callback; runs before the next script run, so the loop below never resumes."""
     st.session_state.automation_running = False
     st.session_state.last_status = "Automation stopped by user. Click 'Start Messaging Session' to resume."
-    status_message_placeholder.info(st.session_state.last_status)
+    st.session_state.last_status_level = "info"
 
-if start_button:
-    influencer_ids = [i.strip() for i in influencer_ids_input.split('\n') if i.strip()]
-    messages_to_send = [msg.strip() for msg in st.session_state.custom_messages if msg.strip()]
+def start_automation():
+    """Start button callback; validates the inputs and arms the session so this same run starts the loop."""
+    influencer_ids = [i.strip() for i in st.session_state.influencer_ids_input.split('\n') if i.strip()]
+    messages_to_send = get_messages_to_send()
     images_to_send = st.session_state.get('uploaded_image_paths', [])
 
+    st.session_state.automation_running = False
+    st.session_state.last_status_level = "error"
     if not influencer_ids:
         st.session_state.last_status = "Please enter at least one Influencer ID."
-        status_message_placeholder.error(st.session_state.last_status)
-        st.session_state.automation_running = False
     elif not messages_to_send and not images_to_send:
         st.session_state.last_status = "Please enter at least one message OR upload at least one image to send."
-        status_message_placeholder.error(st.session_state.last_status)
-        st.session_state.automation_running = False
-    elif not cookie_data.strip():
+    elif not st.session_state.cookie_data.strip():
         st.session_state.last_status = "Please provide your Instagram login cookies."
-        status_message_placeholder.error(st.session_state.last_status)
-        st.session_state.automation_running = False
+    elif not cookies_look_valid(st.session_state.cookie_data):
+        st.session_state.last_status = "The cookies are not a valid JSON cookie export. Please paste the full exported list."
     else:
+        st.session_state.last_status_level = "info"
         st.session_state.automation_running = True
         st.session_state['influencer_list'] = influencer_ids
         st.session_state['current_influencer_index'] = 0
-        st.rerun()
+        st.session_state['failed_influencers'] = []
+        st.session_state['status_log'] = deque(maxlen=STATUS_LOG_LINES)
+
+col1, col2 = st.columns(2)
+status_message_placeholder = st.empty()
+
+with col1:
+    start_button_disabled = st.session_state.automation_running
+    st.button("Start Messaging Session", type="primary", use_container_width=True, disabled=start_button_disabled, on_click=start_automation)
+
+with col2:
+    stop_button_disabled = not st.session_state.automation_running
+    st.button("Stop Automation", type="secondary", use_container_width=True, disabled=stop_button_disabled, on_click=request_stop)
 
 # --- Automation Loop Logic ---
-if st.session_state.automation_running and st.session_state.get('influencer_list') and \
-   st.session_state['current_influencer_index'] < len(st.session_state['influencer_list']):
+def automation_pending():
+    """True while there are influencers left to message in a running session."""
+    return st.session_state.automation_running and st.session_state.get('influencer_list') and \
+        st.session_state['current_influencer_index'] < len(st.session_state['influencer_list'])
+
+def run_automation():
+    """Runs the automation while holding the browser's run lock, or reports that another session has it."""
+    run_lock = get_driver_singleton()["run_lock"]
+    if not run_lock.acquire(blocking=False):
+        st.session_state.automation_running = False
+        st.session_state.last_status = "The automated browser is busy with another session's run. Try again once it has finished."
+        st.session_state.last_status_level = "error"
+        st.rerun()
+    try:
+        message_influencers()
+    finally:
+        run_lock.release()
+
+def message_influencers():
+    """Messages every remaining influencer within this script run, one tab-pool batch at a time."""
+    from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
 
-    influencer_id = st.session_state['influencer_list'][st.session_state['current_influencer_index']]
-    messages_to_send = [msg.strip() for msg in st.session_state.custom_messages if msg.strip()]
+    # Session state reads go through Streamlit's proxy, so the loop works on locals and only
+    # writes the index back (needed to resume if this run is interrupted).
+    messages_to_send = get_messages_to_send()
     image_paths_to_send = st.session_state.get('uploaded_image_paths', [])
+    influencer_list = st.session_state['influencer_list']
+    idx = st.session_state['current_influencer_index']
+    failed_influencers = st.session_state['failed_influencers']
+    total_influencers = len(influencer_list)
     
-    st.markdown(f"---")
-    st.subheader(f"Automating for Influencer: `{influencer_id}`")
+    st.markdown("---")
+    if image_paths_to_send:
+        st.warning("Warning: Image upload on Instagram is highly prone to failure. Use with caution.")
+    batch_header = st.empty()
+    progress_bar = st.progress(idx / total_influencers)
     
+    # Fetched once per run; the loop below works on this local.
     driver = get_selenium_driver()
-    if not driver:
-        st.session_state.automation_running = False
-        st.stop()
-    
-    # Base URL to apply cookies to before navigation
-    base_url = "https://www.instagram.com/"
-    
-    if not apply_cookies(driver, cookie_data):
-        st.warning("Failed to apply cookies. Please ensure they are valid and try again.")
-        st.session_state.automation_running = False
-        st.stop()
     
-    chat_url = f"https://www.instagram.com/direct/t/{influencer_id}/"
-    st.session_state.last_status = f"Navigating to chat for influencer `{influencer_id}`..."
-    status_message_placeholder.info(st.session_state.last_status)
+    # Cookies live for the whole browser session; only reapply them when the pasted text changes.
+    cookies_hash = hashlib.sha256(cookie_data.encode()).hexdigest()
+    singleton = get_driver_singleton()
+    if singleton["applied_cookies_hash"] != cookies_hash:
+        try:
+            cookies = parse_cookies(cookie_data)
+        except json.JSONDecodeError as e:
+            st.error(f"❌ Failed to apply cookies: {e}")
+            cookies = None
+        if cookies is None or not apply_cookies(driver, cookies):
+            st.warning("Failed to apply cookies. Please ensure they are valid and try again.")
+            st.session_state.automation_running = False
+            st.stop()
+        singleton["applied_cookies_hash"] = cookies_hash
 
+    # Set only while a send is in progress, so browser errors elsewhere (navigation, tab setup,
+    # the rate-limit check) are not pinned on whichever ID the loop variables last held.
+    current_influencer_id = None
+    consec_fail = st.session_state.consec_fail
     try:
-        driver.get(chat_url)
-        
-        message_input_selector = 'textarea[placeholder*="Message..."]'
-        
-        WebDriverWait(driver, 40).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, message_input_selector))
-        )
-        message_textarea = driver.find_element(By.CSS_SELECTOR, message_input_selector)
-
-        for i, msg_content in enumerate(messages_to_send):
-            message_textarea.clear()
-            message_textarea.send_keys(msg_content)
-            
-            st.session_state.last_status = f"Pasting message {i+1} for `{influencer_id}`. Sending..."
-            status_message_placeholder.success(st.session_state.last_status)
+        # Stop only takes effect once Streamlit interrupts this run, so the flag is also
+        # rechecked between influencers and during backoffs.
+        while idx < total_influencers and st.session_state.automation_running:
+            influencer_batch = influencer_list[idx:idx + TAB_POOL_SIZE]
+            batch_header.subheader(f"Automating for Influencers: {', '.join(f'`{i}`' for i in influencer_batch)}")
             
-            time.sleep(1)
-            message_textarea.send_keys(Keys.ENTER)
-            
-            st.session_state.last_status = f"Message {i+1} sent successfully."
-            status_message_placeholder.success(st.session_state.last_status)
-            
-            time.sleep(2)
-
-        if image_paths_to_send:
-            st.warning("Warning: Image upload on Instagram is highly prone to failure. Use with caution.")
-            st.session_state.last_status = f"Attempting to upload {len(image_paths_to_send)} image(s)..."
-            status_message_placeholder.info(st.session_state.last_status)
-            try:
-                file_input_selector = 'input[accept*="image/jpeg,image/png,image/heic,image/heif,video/mp4,video/quicktime"]'
-                file_input_element = WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, file_input_selector))
-                )
-                
-                all_image_paths_string = "\n".join(image_paths_to_send)
-                file_input_element.send_keys(all_image_paths_string)
-                
-                st.session_state.last_status = "Image(s) sent to upload input. Waiting for Instagram to process..."
-                status_message_placeholder.success(st.session_state.last_status)
-                time.sleep(10)
-            except Exception as e:
-                st.session_state.last_status = f"Error during image upload: {e}. Proceeding without image for this influencer."
-                status_message_placeholder.error(st.session_state.last_status)
-            finally:
-                for temp_path in image_paths_to_send:
-                    if os.path.exists(temp_path):
-                        os.remove(temp_path)
-                st.session_state['uploaded_image_paths'] = []
-
-        st.session_state['current_influencer_index'] += 1
-        time.sleep(5)
-        
-        if st.session_state.automation_running and st.session_state['current_influencer_index'] < len(st.session_state['influencer_list']):
-            st.session_state.last_status = f"Messages sent to `{influencer_id}`. Moving to next influencer..."
-            status_message_placeholder.info(st.session_state.last_status)
-            st.rerun()
-        else:
-            st.session_state.last_status = "All influencers processed. Automation finished."
-            status_message_placeholder.success(st.session_state.last_status)
+            report_status(status_message_placeholder, "info", f"Navigating to {len(influencer_batch)} chat(s) in parallel tabs...")
+
+            # Kick off every chat load before waiting on any of them, so the page loads overlap.
+            tab_handles = get_tab_handles(driver, len(influencer_batch))
+            for handle, influencer_id in zip(tab_handles, influencer_batch):
+                chat_url = INSTAGRAM_BASE_URL.rstrip('/') + direct_thread_path(influencer_id)
+                driver.switch_to.window(handle)
+                # A tab already showing this chat (e.g. a repeated ID) is left as is instead of reloading.
+                driver.execute_script("if (window.location.href !== arguments[0]) window.location.href = arguments[0];", chat_url)
+
+            for handle, influencer_id in zip(tab_handles, influencer_batch):
+                if not st.session_state.automation_running:
+                    break
+                driver.switch_to.window(handle)
+                current_influencer_id = influencer_id
+                try:
+                    send_to_influencer(driver, influencer_id, messages_to_send, image_paths_to_send, status_message_placeholder)
+                except TimeoutException:
+                    report_status(status_message_placeholder, "warning", f"Timeout for `{influencer_id}`. Could not find a required element. Moving to next influencer.")
+                    failed_influencers.append({"Influencer ID": influencer_id, "Reason": "Timed out waiting for the chat"})
+                except MessagesNotConfirmed as e:
+                    report_status(status_message_placeholder, "warning", f"Only {e.sent} of {e.total} message(s) to `{influencer_id}` were confirmed. Check the chat before retrying. Moving to next influencer.")
+                    failed_influencers.append({"Influencer ID": influencer_id, "Reason": f"Partial send: {e.sent} of {e.total} message(s) confirmed"})
+                except NoSuchElementException as e:
+                    report_status(status_message_placeholder, "warning", f"Element not found for `{influencer_id}`: {e}. Instagram's UI might have changed. Moving to next influencer.")
+                    failed_influencers.append({"Influencer ID": influencer_id, "Reason": "Required element not found"})
+                current_influencer_id = None
+                idx += 1
+                st.session_state['current_influencer_index'] = idx
+
+                # Only slow down once Instagram signals throttling, backing off harder each time in a row.
+                if is_rate_limited(driver):
+                    consec_fail += 1
+                    backoff_seconds = min(60, 2 ** consec_fail)
+                    report_status(status_message_placeholder, "warning", f"Instagram is rate limiting messages. Pausing for {backoff_seconds}s...")
+                    # One-second slices: each progress redraw is a point where Streamlit can stop
+                    # the run if Stop was pressed, and the flag is checked before every slice.
+                    for _ in range(backoff_seconds):
+                        if not st.session_state.automation_running:
+                            break
+                        time.sleep(1)
+                        progress_bar.progress(idx / total_influencers)
+                else:
+                    consec_fail = 0
+                progress_bar.progress(idx / total_influencers)
+
+        if idx >= total_influencers:
+            report_status(status_message_placeholder, "success", "All influencers processed. Automation finished.")
             st.session_state.automation_running = False
             st.session_state['influencer_list'] = []
             st.session_state['current_influencer_index'] = 0
+            # Saved images are only thrown away once every influencer got them; after a stop or
+            # failure they stay on disk for the retry.
+            if not failed_influencers:
+                cleanup_upload_temp_dir()
 
-    except TimeoutException:
-        st.session_state.last_status = f"Timeout for `{influencer_id}`. Could not find a required element. Moving to next influencer."
-        status_message_placeholder.warning(st.session_state.last_status)
-        st.session_state['current_influencer_index'] += 1
-        st.rerun()
-    except NoSuchElementException as e:
-        st.session_state.last_status = f"Element not found for `{influencer_id}`: {e}. Instagram's UI might have changed. Moving to next influencer."
-        status_message_placeholder.warning(st.session_state.last_status)
-        st.session_state['current_influencer_index'] += 1
-        st.rerun()
     except WebDriverException as e:
-        st.session_state.last_status = f"Browser error during automation for `{influencer_id}`: {e}. The connection might have been lost. Automation stopped."
-        status_message_placeholder.error(st.session_state.last_status)
-        close_selenium_driver()
+        for_influencer = f" for `{current_influencer_id}`" if current_influencer_id else ""
+        report_status(status_message_placeholder, "error", f"Browser error during automation{for_influencer}: {e}. The connection might have been lost. Automation stopped.")
         st.session_state.automation_running = False
+        close_selenium_driver()
     except Exception as e:
-        st.session_state.last_status = f"An unexpected error occurred for `{influencer_id}`: {e}. Automation stopped."
-        status_message_placeholder.error(st.session_state.last_status)
+        for_influencer = f" for `{current_influencer_id}`" if current_influencer_id else ""
+        report_status(status_message_placeholder, "error", f"An unexpected error occurred{for_influencer}: {e}. Automation stopped.")
         st.session_state.automation_running = False
+    finally:
+        st.session_state.consec_fail = consec_fail
     
-    if not st.session_state.automation_running:
-        st.stop()
+    # Full rerun so the Start/Stop buttons reflect the stopped session.
+    st.rerun()
 
+if automation_pending():
+    run_automation()
 else:
-    status_message_placeholder.info(st.session_state.last_status)
+    getattr(status_message_placeholder, st.session_state.last_status_level)(st.session_state.last_status)
+    if st.session_state['failed_influencers']:
+        st.subheader("Influencers Skipped")
+        st.dataframe(st.session_state['failed_influencers'], use_container_width=True)
@@ -0,0 +1,65 @@
+"""Reattaching to a saved browser session has to work without CDP."""
+import importlib.util
+import json
+import pathlib
+from unittest import mock
+
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("selenium")
+from selenium.webdriver.remote.webdriver import WebDriver
+
+APP_PATH = pathlib.Path(__file__).resolve().parent.parent / "app0.1.py"
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # The session file and Chrome profile paths are expanded from HOME when the script runs.
+    monkeypatch.setenv("HOME", str(tmp_path))
+    spec = importlib.util.spec_from_file_location("app0_1", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_reattached_driver_falls_back_from_cdp(app):
+    with open(app.DRIVER_SESSION_FILE, "w") as f:
+        json.dump({"executor_url": "http://127.0.0.1:9", "session_id": "saved-session"}, f)
+
+    commands = []
+
+    def fake_execute(self, driver_command, params=None):
+        commands.append(driver_command)
+        return {"value": "Instagram"}
+
+    with mock.patch.object(WebDriver, "execute", fake_execute):
+        driver = app.reconnect_selenium_driver()
+        assert driver is not None
+        assert driver.session_id == "saved-session"
+        assert not app.supports_cdp(driver)
+
+        app.block_heavy_resources(driver)
+        cookies = [{"name": "sessionid", "value": "abc", "domain": ".instagram.com", "path": "/"}]
+        assert app.apply_cookies(driver, cookies)
+
+    assert not any("cdp" in command.lower() for command in commands)
+    assert "addCookie" in commands
+
+
+def test_close_resets_a_dead_reattached_driver(app):
+    from selenium.common.exceptions import InvalidSessionIdException
+
+    with open(app.DRIVER_SESSION_FILE, "w") as f:
+        json.dump({"executor_url": "http://127.0.0.1:9", "session_id": "saved-session"}, f)
+
+    with mock.patch.object(WebDriver, "execute", lambda self, driver_command, params=None: {"value": ""}):
+        driver = app.reconnect_selenium_driver()
+    singleton = app.get_driver_singleton()
+    singleton["driver"] = driver
+
+    with mock.patch.object(WebDriver, "execute", side_effect=InvalidSessionIdException("session deleted")):
+        app.close_selenium_driver()
+
+    assert singleton["driver"] is None
+    assert not app.os.path.exists(app.DRIVER_SESSION_FILE)